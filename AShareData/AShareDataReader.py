@@ -1,31 +1,42 @@
 from functools import cached_property, lru_cache
+from typing import Sequence
 
 import numpy as np
 
 from . import DateUtils
 from .config import generate_db_interface_from_config, get_db_interface
 from .DBInterface import DBInterface
-from .Factor import BetaFactor, BinaryFactor, CompactFactor, ContinuousFactor, IndexConstitute, IndustryFactor, \
-    LatestAccountingFactor, OnTheRecordFactor, TTMAccountingFactor, UnaryFactor
+from .Factor import _get_calendar, BetaFactor, BinaryFactor, CompactFactor, ContinuousFactor, IndexConstitute, \
+    IndustryFactor, LatestAccountingFactor, OnTheRecordFactor, TTMAccountingFactor, UnaryFactor
 from .Tickers import StockTickers
 
 
+@lru_cache(64)
+def _exponential_weight(n: int, half_life: int) -> np.ndarray:
+    weight = np.exp2(np.arange(-(n - 1), 1) / half_life)
+    weight.setflags(write=False)
+    return weight
+
+
 class AShareDataReader(object):
-    def __init__(self, db_interface: DBInterface = None) -> None:
+    def __init__(self, db_interface: DBInterface = None, prefetch: bool = False) -> None:
         """
         AShare Data Reader
 
         :param db_interface: DBInterface
+        :param prefetch: 是否在初始化时预读所有 ``CompactFactor`` 的数据
         """
 
         if db_interface is None:
             db_interface = get_db_interface()
         self.db_interface = db_interface
+        if prefetch:
+            self.prefetch_compact_factors()
 
     @cached_property
     def calendar(self) -> DateUtils.TradingCalendar:
         """交易日历"""
-        return DateUtils.TradingCalendar(self.db_interface)
+        return _get_calendar(self.db_interface)
 
     @cached_property
     def stocks(self) -> StockTickers:
@@ -223,10 +234,26 @@ class AShareDataReader(object):
         f.set_factor_name('1年shibor')
         return f
 
+    def prefetch_compact_factors(self, names: Sequence[str] = None) -> None:
+        """
+        合并查询, 预读 ``CompactFactor`` 的数据, 并存入 ``db_interface`` 的表缓存
+
+        :param names: 需要预读的表名, 默认为全部
+        """
+        factors = [self.sec_name, self.adj_factor, self.free_a_shares, self.total_share, self.floating_share,
+                   self.free_floating_share]
+        if names:
+            factors = [it for it in factors if it.table_name in names]
+        data = self.db_interface.read_compact_tables([it.table_name for it in factors])
+        # 写入数据库接口的表缓存, 之后新建的同表因子也直接使用预读的数据
+        for factor in factors:
+            self.db_interface.cache_table(factor.table_name, data[factor.table_name])
+            factor.data = None
+
     @staticmethod
-    def exponential_weight(n: int, half_life: int):
-        series = range(-(n - 1), 1)
-        return np.exp(np.log(2) * series / half_life)
+    def exponential_weight(n: int, half_life: int) -> np.ndarray:
+        """长度为 ``n``, 半衰期为 ``half_life`` 的指数权重. 结果会被缓存, 为只读数组"""
+        return _exponential_weight(n, half_life)
 
     @classmethod
     def from_config(cls, json_loc: str):
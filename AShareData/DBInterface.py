@@ -1,7 +1,7 @@
 import datetime as dt
 import logging
 import time
-from typing import List, Mapping, Optional, Sequence, Union
+from typing import Dict, List, Mapping, Optional, Sequence, Union
 
 import numpy as np
 import pandas as pd
@@ -18,7 +18,7 @@ class DBInterface(object):
     """Database Interface Base Class"""
 
     def __init__(self):
-        pass
+        self._table_cache = {}
 
     def create_table(self, table_name: str, table_info: Mapping[str, str]) -> None:
         """Create table named ``table_name`` with column name adn type specified in ``table_info``"""
@@ -52,6 +52,33 @@ class DBInterface(object):
         """Read data from ``table_name``"""
         raise NotImplementedError()
 
+    def read_snapshot(self, table_name: str, columns: Sequence[str] = None, date: dt.datetime = None,
+                      ids: Sequence[str] = None, inclusive: bool = True) -> Union[pd.Series, pd.DataFrame]:
+        """Read the latest record of each ID in ``table_name`` as of ``date``"""
+        raise NotImplementedError()
+
+    def read_compact_tables(self, table_names: Sequence[str]) -> Dict[str, pd.Series]:
+        """Read several compact tables({'DateTime', 'ID', table_name}) in as few queries as possible"""
+        raise NotImplementedError()
+
+    def read_cached_table(self, table_name: str) -> Union[pd.Series, pd.DataFrame]:
+        """Read the whole ``table_name`` once and keep it until the table is written through this interface"""
+        key = table_name.lower()
+        if key not in self._table_cache:
+            self._table_cache[key] = self.read_table(table_name)
+        return self._table_cache[key]
+
+    def cache_table(self, table_name: str, data: Union[pd.Series, pd.DataFrame]) -> None:
+        """Keep ``data`` as the cached content of ``table_name``"""
+        self._table_cache[table_name.lower()] = data
+
+    def clear_table_cache(self, table_name: str = None) -> None:
+        """Drop the cached ``table_name``, or every cached table if ``table_name`` is None"""
+        if table_name is None:
+            self._table_cache.clear()
+        else:
+            self._table_cache.pop(table_name.lower(), None)
+
     def get_all_id(self, table_name: str) -> Optional[List[str]]:
         """Get all stocks in a table"""
         raise NotImplementedError()
@@ -170,12 +197,14 @@ class MySQLInterface(DBInterface):
         for table in self.meta.tables.values():
             table.drop()
         self.meta.reflect()
+        self.clear_table_cache()
 
     def purge_table(self, table_name: str) -> None:
         assert table_name in self.meta.tables.keys(), f'数据库中无名为 {table_name} 的表'
         table = self.meta.tables[table_name]
         conn = self.engine.connect()
         conn.execute(table.delete())
+        self.clear_table_cache(table_name)
         logging.getLogger(__name__).debug(f'table {table_name} purged')
 
     def insert_df(self, df: Union[pd.Series, pd.DataFrame], table_name: str) -> None:
@@ -184,6 +213,7 @@ class MySQLInterface(DBInterface):
 
         start_timestamp = time.time()
         df.to_sql(table_name, self.engine, if_exists='append')
+        self.clear_table_cache(table_name)
         end_timestamp = time.time()
         logging.getLogger(__name__).debug(f'插入数据耗时 {(end_timestamp - start_timestamp):.2f} 秒.')
 
@@ -212,6 +242,7 @@ class MySQLInterface(DBInterface):
             insert_statement = insert(table).values(**row.to_dict())
             statement = insert_statement.on_duplicate_key_update(**row.to_dict())
             self.engine.execute(statement)
+        self.clear_table_cache(table_name)
         end_timestamp = time.time()
         logging.getLogger(__name__).debug(f'插入数据耗时 {(end_timestamp - start_timestamp):.2f} 秒.')
 
@@ -219,12 +250,14 @@ class MySQLInterface(DBInterface):
         if df.empty:
             return
 
-        existing_data = self.read_table(table_name) if old_df is None else old_df
+        current_date = df.index.get_level_values('DateTime').to_pydatetime()[0]
+        if old_df is None:
+            existing_data = self.read_snapshot(table_name, date=current_date, inclusive=False)
+        else:
+            existing_data = old_df.loc[old_df.index.get_level_values('DateTime') < current_date]
         if existing_data.empty:
             self.update_df(df, table_name)
         else:
-            current_date = df.index.get_level_values('DateTime').to_pydatetime()[0]
-            existing_data = existing_data.loc[existing_data.index.get_level_values('DateTime') < current_date]
             new_info = compute_diff(df, existing_data)
             self.update_df(new_info, table_name)
 
@@ -363,10 +396,11 @@ class MySQLInterface(DBInterface):
                 q = q.filter(t.columns['DateTime'].in_(dates))
             else:
                 q = q.filter(t.columns['DateTime'] == dates)
-        elif end_date is not None:
-            q = q.filter(t.columns['DateTime'] <= end_date)
+        else:
             if start_date is not None:
                 q = q.filter(t.columns['DateTime'] >= start_date)
+            if end_date is not None:
+                q = q.filter(t.columns['DateTime'] <= end_date)
         if report_period is not None:
             q = q.filter(t.columns['报告期'] == report_period)
         if report_month is not None:
@@ -380,17 +414,90 @@ class MySQLInterface(DBInterface):
 
         ret = pd.read_sql(q.statement, con=self.engine)
         session.close()
+        return self._format_read_result(ret, t, columns, index_col)
+
+    def read_snapshot(self, table_name: str, columns: Union[str, Sequence[str]] = None, date: dt.datetime = None,
+                      ids: Sequence[str] = None, inclusive: bool = True) -> Union[pd.Series, pd.DataFrame]:
+        """ 读取数据库中每个 ID 截至 ``date`` 的最新记录
+
+        在数据库中以 ``GROUP BY ID`` 的 ``MAX(DateTime)`` 子表连接取得每个 ID 的最新记录, 不必下载全部历史数据后再 ``groupby('ID').tail(1)``
+
+        :param table_name: 表名
+        :param columns: 所需的列名
+        :param date: 查询日期, 默认为最新
+        :param ids: 合约代码
+        :param inclusive: 是否包含 ``date`` 当天的记录
+        :return:
+        """
+        table_name = table_name.lower()
+        index_col = self.get_table_primary_keys(table_name)
+
+        t = self.meta.tables[table_name]
+        if columns:
+            if isinstance(columns, str):
+                columns = [columns]
+            columns = list(columns) + index_col
+        else:
+            columns = [it.name for it in t.columns]
+
+        latest = sa.select([t.c.ID, func.max(t.c.DateTime).label('latest_date')])
+        if date is not None:
+            latest = latest.where(t.c.DateTime <= date if inclusive else t.c.DateTime < date)
+        if ids is not None:
+            latest = latest.where(t.c.ID.in_(ids))
+        latest = latest.group_by(t.c.ID).subquery('m')
+        on_clause = sa.and_(t.c.ID == latest.c.ID, t.c.DateTime == latest.c.latest_date)
+        q = sa.select([t.c[it] for it in columns]).select_from(t.join(latest, on_clause))
+
+        ret = pd.read_sql(q, con=self.engine)
+        return self._format_read_result(ret, t, columns, index_col)
+
+    @staticmethod
+    def _format_read_result(ret: pd.DataFrame, t: sa.Table, columns: Sequence[str],
+                            index_col: Optional[List[str]]) -> Union[pd.Series, pd.DataFrame]:
+        # DATE 列读出为 python date 对象, 统一转为 datetime64 以便向量化比较
+        for it in columns:
+            if it in ['DateTime', '报告期'] or isinstance(t.c[it].type, (Date, DateTime)):
+                ret[it] = pd.to_datetime(ret[it])
         if index_col:
-            if 'DateTime' in index_col:
-                ret.DateTime = pd.to_datetime(ret.DateTime)
-            if '报告期' in index_col:
-                ret['报告期'] = pd.to_datetime(ret['报告期'])
             ret = ret.set_index(index_col, drop=True)
 
         if ret.shape[1] == 1:
             ret = ret.iloc[:, 0]
         return ret
 
+    def read_compact_tables(self, table_names: Sequence[str]) -> Dict[str, pd.Series]:
+        """ 以 ``UNION ALL`` 合并读取多个 {'DateTime', 'ID', 表名} 结构的表
+
+        数值表与文本表分别合并查询, 以免 MySQL 将数值结果转为文本
+
+        :param table_names: 表名
+        :return: {表名: 数据}
+        """
+        groups = {}
+        for table_name in table_names:
+            t = self.meta.tables[table_name.lower()]
+            column = t.c[table_name]
+            stmt = sa.select([sa.literal(table_name, Text).label('table_tag'), t.c.DateTime, t.c.ID, column.label('value')])
+            is_numeric = isinstance(column.type, (sa.Numeric, sa.Integer))
+            groups.setdefault(is_numeric, []).append((table_name, stmt))
+
+        ret = {}
+        for is_numeric, items in groups.items():
+            data = pd.read_sql(sa.union_all(*[stmt for _, stmt in items]), con=self.engine)
+            data.DateTime = pd.to_datetime(data.DateTime)
+            for table_name, table_data in data.groupby('table_tag'):
+                series = table_data.set_index(['DateTime', 'ID'])['value'].sort_index()
+                series.name = table_name
+                ret[table_name] = series
+            # 无记录的表不出现在 groupby 结果中, 以空序列补齐
+            empty_index = pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), []], names=['DateTime', 'ID'])
+            for table_name, _ in items:
+                if table_name not in ret:
+                    ret[table_name] = pd.Series(index=empty_index, dtype='float64' if is_numeric else 'object',
+                                                name=table_name)
+        return ret
+
     def exist_table(self, table_name: str) -> bool:
         """ 数据库中是否存在该表"""
         table_name = table_name.lower()
@@ -409,6 +516,7 @@ class MySQLInterface(DBInterface):
         stmt = t.delete().where(t.c.ID == ticker)
         conn = self.engine.connect()
         conn.execute(stmt)
+        self.clear_table_cache(table_name)
 
 
 def compute_diff(input_data: pd.Series, db_data: pd.Series) -> Optional[pd.Series]:
@@ -4,6 +4,9 @@ import inspect
 from functools import wraps
 from typing import Callable, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
+import pandas as pd
+
 from .config import get_db_interface
 from .DBInterface import DBInterface
 
@@ -191,7 +194,7 @@ class TradingCalendar(TradingCalendarBase):
         if db_interface is None:
             db_interface = get_db_interface()
         calendar_df = db_interface.read_table('交易日历')
-        self.calendar = sorted(calendar_df['交易日期'].dt.to_pydatetime().tolist())
+        self.calendar = pd.DatetimeIndex(np.unique(calendar_df['交易日期'].to_numpy())).to_pydatetime().tolist()
 
 
 class HKTradingCalendar(TradingCalendarBase):
@@ -202,7 +205,7 @@ class HKTradingCalendar(TradingCalendarBase):
         if db_interface is None:
             db_interface = get_db_interface()
         calendar_df = db_interface.read_table('港股交易日历')
-        self.calendar = sorted(calendar_df['交易日期'].dt.to_pydatetime().tolist())
+        self.calendar = pd.DatetimeIndex(np.unique(calendar_df['交易日期'].to_numpy())).to_pydatetime().tolist()
 
 
 class ReportingDate(object):
@@ -260,6 +263,26 @@ class ReportingDate(object):
         else:
             raise ValueError(f'Illegal offset_str: {offset_str}')
 
+    @staticmethod
+    def offset_index(report_dates: Sequence[dt.datetime], offset_str: str) -> pd.DatetimeIndex:
+        """报告期偏移, ``offset`` 的向量化版本
+
+        :param report_dates: 基准报告期
+        :param offset_str: 偏移量：如``q3``， ``y1``
+        :return: 偏移后的报告期
+        """
+        report_dates = pd.DatetimeIndex(report_dates)
+        delta = -int(offset_str[1:])
+        if offset_str[0] == 'q':
+            rep = report_dates.year * 12 + report_dates.month + delta * 3 - 1
+            year, month = rep // 12, rep % 12 + 1
+            day = np.where((month == 3) | (month == 12), 31, 30)
+        elif offset_str[0] == 'y':
+            year, month, day = report_dates.year + delta, 12, 31
+        else:
+            raise ValueError(f'Illegal offset_str: {offset_str}')
+        return pd.DatetimeIndex(pd.to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': day})))
+
     @staticmethod
     def get_latest_report_date(date: Union[dt.date, dt.datetime] = None) -> List[dt.datetime]:
         """
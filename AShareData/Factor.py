@@ -1,7 +1,7 @@
 import datetime as dt
 import numbers
-from functools import cached_property, partial
-from typing import Dict, List, Sequence, Union
+from functools import cached_property, lru_cache, partial
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -12,6 +12,57 @@ from .DBInterface import DBInterface
 from .utils import TickerSelector
 
 
+# 数值范围和精度允许以 float32 存储的 ``CompactFactor`` 表. 股本以股为单位, 超出 float32 可精确表示的整数范围, 不在此列
+_FLOAT32_COMPACT_TABLES = ('复权因子',)
+
+
+def _compact_dtype(data: pd.Series, table_name: str) -> pd.Series:
+    """白名单中的数值表转为 float32, 重复较多的字符串转为 category"""
+    if table_name in _FLOAT32_COMPACT_TABLES and data.dtype.kind in 'fiu':
+        return data.astype(np.float32, copy=False)
+    if data.dtype == object and data.nunique() < data.shape[0] // 2:
+        return data.astype('category')
+    return data
+
+
+def _read_compact_table(db_interface: DBInterface, table_name: str) -> pd.Series:
+    """读取 ``CompactFactor`` 的数据表. 数据缓存于 ``db_interface``, 同一表只从数据库读取一次, 写入该表后失效"""
+    data = db_interface.read_cached_table(table_name)
+    compact = _compact_dtype(data, table_name)
+    if compact is not data:
+        db_interface.cache_table(table_name, compact)
+    return compact
+
+
+@lru_cache(4)
+def _get_calendar(db_interface: DBInterface) -> DateUtils.TradingCalendar:
+    """同一数据库的交易日历只读取一次, 由所有因子共享"""
+    return DateUtils.TradingCalendar(db_interface)
+
+
+@lru_cache(None)
+def _load_industry_translation(table_name: str, level: int) -> Dict[str, str]:
+    """读取 ``industry.json`` 中最细分行业到 ``level`` 级行业的对应关系"""
+    translation = utils.load_param('industry.json')
+    return {key: value[f'level_{level}'] for key, value in translation[table_name].items()}
+
+
+def _fast_unstack(series: pd.Series) -> pd.DataFrame:
+    """等价于 ``series.unstack()``, 直接按索引编码填充 numpy 数组. 要求 ``series`` 的索引无重复"""
+    row_codes, rows = pd.factorize(series.index.get_level_values(0), sort=True)
+    col_codes, cols = pd.factorize(series.index.get_level_values(1), sort=True)
+    if series.dtype.kind == 'f':
+        dtype = series.dtype
+    elif series.dtype.kind in 'iu':
+        dtype = np.float64
+    else:
+        dtype = object
+    out = np.full((len(rows), len(cols)), np.nan, dtype=dtype)
+    out[row_codes, col_codes] = series.to_numpy()
+    return pd.DataFrame(out, index=rows.rename(series.index.names[0]), columns=cols.rename(series.index.names[1]),
+                        copy=False)
+
+
 class FactorBase(object):
     def __init__(self, factor_name: str = None):
         super().__init__()
@@ -313,6 +364,11 @@ class Factor(FactorBase):
             db_interface = get_db_interface()
         self.db_interface = db_interface
 
+    @cached_property
+    def calendar(self) -> DateUtils.TradingCalendar:
+        """交易日历"""
+        return _get_calendar(self.db_interface)
+
     def _get_data(self, *args, **kwargs):
         """获取数据"""
         raise NotImplementedError()
@@ -366,8 +422,43 @@ class CompactFactor(NonFinancialFactor):
 
     def __init__(self, table_name: str, db_interface: DBInterface = None):
         super().__init__(table_name, table_name, db_interface)
-        self.data = self.db_interface.read_table(table_name)
-        self.calendar = DateUtils.TradingCalendar(db_interface)
+        self._data = None
+
+    @property
+    def data(self) -> pd.Series:
+        """数据库中的原始数据, 首次访问时读取. 与同一数据库的其他实例共享数据, 修改时请重新赋值而非原地修改"""
+        if self._data is None:
+            self._data = _read_compact_table(self.db_interface, self.table_name).copy(deep=False)
+        return self._data
+
+    @data.setter
+    def data(self, data: Optional[pd.Series]) -> None:
+        """赋值为 ``None`` 时, 下次访问重新从 ``db_interface`` 的缓存读取"""
+        self._data = None if data is None else _compact_dtype(data, self.table_name)
+        self.__dict__.pop('_unstacked_ffilled', None)
+
+    @cached_property
+    def _unstacked_ffilled(self) -> Tuple[pd.DataFrame, Optional[np.ndarray]]:
+        """
+        按交易日展开并向前填充的全部数据
+
+        非数值数据(名称, 行业, 布尔标记等)以 float32 编码展开, 避免生成 object 数组, 同时返回编码对应的取值
+        """
+        data = self.data
+        labels = None
+        if data.dtype.kind not in 'fiu':
+            codes, labels = pd.factorize(data)
+            labels = np.asarray(labels)
+            codes = np.where(codes < 0, np.nan, codes).astype(np.float32)
+            data = pd.Series(codes, index=data.index)
+        df = _fast_unstack(data)
+        calendar = pd.DatetimeIndex(self.calendar.calendar)
+        date_list = calendar[calendar >= df.index.min()]
+        df = df.ffill().reindex(date_list, method='ffill')
+        # 按日期切片后 stack, 保持行优先的内存布局
+        if not df.values.flags.c_contiguous:
+            df = pd.DataFrame(np.ascontiguousarray(df.values), index=df.index, columns=df.columns, copy=False)
+        return df, labels
 
     def _get_data(self, dates: Union[Sequence[dt.datetime], DateUtils.DateType] = None,
                   start_date: DateUtils.DateType = None, end_date: DateUtils.DateType = None,
@@ -380,31 +471,27 @@ class CompactFactor(NonFinancialFactor):
         :param ticker_selector: TickerSelector that specifies criteria
         :return: pandas.Series with DateTime as index and stock as column
         """
-        if isinstance(dates, dt.datetime):
-            dates = [dates]
-        data = self.data.copy()
-        if ids:
-            data = data.loc[(slice(None), ids)]
-        if dates:
-            end_date = max(dates)
-            start_date = min(dates)
+        if dates is not None:
+            dates = DateUtils.date_type2datetime(dates)
+            if isinstance(dates, dt.datetime):
+                dates = [dates]
         if end_date is None:
             end_date = dt.datetime.today()
-        if start_date is None:
-            start_date = data.index.get_level_values('DateTime').min()
-
-        previous_data = data.loc[data.index.get_level_values('DateTime') <= start_date].groupby('ID').tail(1)
-        index = pd.MultiIndex.from_product([[start_date], previous_data.index.get_level_values('ID')])
-        previous_data.index = index
-        ranged_data = data.loc[(data.index.get_level_values('DateTime') > start_date) &
-                               (data.index.get_level_values('DateTime') <= end_date)]
-        data = pd.concat([previous_data, ranged_data])
-
-        date_list = self.calendar.select_dates(start_date=start_date, end_date=end_date)
-        df = data.unstack().reindex(date_list).ffill()
+
+        if isinstance(ids, str):
+            ids = [ids]
+
+        df, labels = self._unstacked_ffilled
+        if ids:
+            df = df.reindex(list(ids), axis=1)
         if dates:
-            df = df.loc[dates, :]
+            # 早于首条记录或非交易日的日期没有数据
+            df = df.reindex(dates)
+        else:
+            df = df.loc[DateUtils.date_type2datetime(start_date):DateUtils.date_type2datetime(end_date), :]
         ret = df.stack()
+        if labels is not None:
+            ret = pd.Series(labels.take(ret.to_numpy().astype(np.intp)), index=ret.index)
         ret.index.names = ['DateTime', 'ID']
         if ticker_selector:
             index = ticker_selector.generate_index(dates=dates)
@@ -429,12 +516,7 @@ class IndustryFactor(CompactFactor):
         self.display_factor_name = f'{provider}{level}级行业'
 
         if level != constants.INDUSTRY_LEVEL[provider]:
-            translation = utils.load_param('industry.json')
-            new_translation = {}
-            for key, value in translation[table_name].items():
-                new_translation[key] = value[f'level_{level}']
-
-            self.data = self.data.map(new_translation)
+            self.data = self.data.map(_load_industry_translation(table_name, level))
 
     def list_constitutes(self, date: DateUtils.DateType, industry: str) -> List[str]:
         """
@@ -548,7 +630,6 @@ class AccountingFactor(Factor):
 
         table_name = self.fields[factor_name]
         super().__init__(f'合并{table_name}', factor_name, db_interface)
-        self.calendar = DateUtils.TradingCalendar(self.db_interface)
         self.report_month = None
         self.buffer_length = 365 * 2
         self.offset_strs = None
@@ -576,31 +657,28 @@ class AccountingFactor(Factor):
         if self.offset_strs:
             db_columns.extend(self.offset_strs)
         data = self.db_interface.read_table(self.table_name, columns=db_columns,
-                                            start_date=buffer_start, end_date=end_date, report_month=self.report_month,
-                                            ids=ids)
+                                            start_date=buffer_start, end_date=db_end_date,
+                                            report_month=self.report_month, ids=ids)
         if isinstance(data, pd.Series):
             data = data.to_frame()
-        tickers = data.index.get_level_values('ID').unique().tolist()
-        storage = []
-        for ticker in tickers:
-            ticker_data = data.loc[(slice(None), ticker, slice(None)), :]
-            related_dates = self.latest_ts(dates, ticker_data.index.get_level_values('DateTime').tolist())
-            relevant_rec = ticker_data.loc[ticker_data.index.get_level_values('DateTime').isin(related_dates.values())]
-            relevant_rec = relevant_rec.groupby('DateTime').tail(1)
-
-            pre_data = self.gather_data(ticker_data, relevant_rec, self.offset_strs)
-            calc_data = self.func(pre_data)
-            calc_data.index = calc_data.index.get_level_values('DateTime')
-
-            res_index = pd.MultiIndex.from_product([list(related_dates.keys()), [ticker]], names=('DateTime', 'ID'))
-            val = calc_data.loc[related_dates.values()].values
-            content = pd.DataFrame(val, index=res_index)
-            storage.append(content)
-
-        ret = pd.concat(storage)
-        if ret.shape[1] == 1:
-            ret = ret.iloc[:, 0]
-            ret.name = self.factor_name
+        data = data.sort_index()
+
+        # 每个公告日只保留最新报告期的记录
+        announcement_index = data.index.droplevel('报告期')
+        relevant_rec = data.loc[~announcement_index.duplicated(keep='last')]
+        pre_data = self.gather_data(data, relevant_rec, self.offset_strs)
+        calc_data = self.func(pre_data)
+        calc_data.index = calc_data.index.droplevel('报告期')
+        calc_data = calc_data.rename(self.factor_name).reset_index().sort_values('DateTime')
+        calc_data['announced'] = True
+
+        # 查询日期取不晚于该日的最新公告, 尚无公告的 (日期, 股票) 不输出, 计算结果为 NaN 的保留
+        query_dates = pd.DatetimeIndex(sorted(dates), name='DateTime')
+        tickers = data.index.get_level_values('ID').unique()
+        query = pd.MultiIndex.from_product([query_dates, tickers], names=('DateTime', 'ID')).to_frame(index=False)
+        ret = pd.merge_asof(query, calc_data, on='DateTime', by='ID')
+        ret = ret.loc[ret['announced'].notna()]
+        ret = ret.set_index(['DateTime', 'ID'])[self.factor_name].sort_index()
 
         if ticker_selector:
             index = ticker_selector.generate_index(dates=dates)
@@ -611,39 +689,23 @@ class AccountingFactor(Factor):
     def func(data: pd.DataFrame) -> np.float:
         raise NotImplementedError()
 
-    @staticmethod
-    def latest_ts(dates: Sequence[dt.datetime], pd_dates: Sequence[dt.datetime]) -> Dict[dt.datetime, dt.datetime]:
-        ret = {}
-        i = 0
-        pd_len = len(pd_dates)
-        for date in dates:
-            while i <= pd_len - 2:
-                if pd_dates[i] <= date < pd_dates[i + 1]:
-                    ret[date] = pd_dates[i]
-                    break
-                if i == pd_len - 2:
-                    ret[date] = pd_dates[i]
-                    break
-                i += 1
-        return ret
-
-    def gather_data(self, ticker_data: pd.DataFrame, relevant_rec: pd.DataFrame,
+    def gather_data(self, data: pd.DataFrame, relevant_rec: pd.DataFrame,
                     offset_strs: List[str]) -> pd.DataFrame:
         if not offset_strs:
             relevant_rec.columns = ['q0']
             return relevant_rec
-        storage = [self.loc_pre_data(ticker_data, relevant_rec, offset_str).iloc[:, 0].values for offset_str in
+        storage = [self.loc_pre_data(data, relevant_rec, offset_str).iloc[:, 0].values for offset_str in
                    offset_strs]
         storage.append(relevant_rec.iloc[:, 0].values)
         col_names = offset_strs + ['q0']
         return pd.DataFrame(np.stack(storage, axis=1), index=relevant_rec.index, columns=col_names)
 
     @staticmethod
-    def loc_pre_data(ticker_data: pd.DataFrame, relevant_rec: pd.DataFrame, offset_str: str) -> pd.DataFrame:
-        pre_date = [DateUtils.ReportingDate.offset(it, offset_str) for it in relevant_rec.index.get_level_values('报告期')]
-        ticker = ticker_data.index.get_level_values('ID')[0]
-        pre_index = pd.MultiIndex.from_arrays([relevant_rec[offset_str], [ticker] * relevant_rec.shape[0], pre_date])
-        pre_data = ticker_data.reindex(pre_index)
+    def loc_pre_data(data: pd.DataFrame, relevant_rec: pd.DataFrame, offset_str: str) -> pd.DataFrame:
+        pre_date = DateUtils.ReportingDate.offset_index(relevant_rec.index.get_level_values('报告期'), offset_str)
+        pre_index = pd.MultiIndex.from_arrays([relevant_rec[offset_str], relevant_rec.index.get_level_values('ID'),
+                                               pre_date])
+        pre_data = data.reindex(pre_index)
         return pre_data
 
 
@@ -811,12 +873,12 @@ class BetaFactor(FactorBase):
         self.market_ret = market_ret
         if rf_rate is None:
             self.rf_rate = ContinuousFactor('shibor利率数据', '3个月', db_interface)
-        self.calendar = DateUtils.TradingCalendar(db_interface)
+        self.calendar = _get_calendar(db_interface)
 
     def _get_data(self, dates: Sequence[dt.datetime],
                   ids: Union[str, Sequence[str]] = None, ticker_selector: TickerSelector = None,
                   look_back_period: int = 60, min_trading_days: int = 40) -> pd.Series:
-        storage = []
+        dates_out, ids_out, values_out = [], [], []
         for date in dates:
             if ticker_selector:
                 ids = ticker_selector.ticker(date)
@@ -837,8 +899,10 @@ class BetaFactor(FactorBase):
                 else:
                     cov_matrix = np.cov(group.iloc[:, 2], group.iloc[:, 3])
                     beta = cov_matrix[0, 1] / cov_matrix[1, 1]
-                data = pd.Series(beta, index=pd.MultiIndex.from_tuples([(date, ID)], names=('DateTime', 'ID')))
-                storage.append(data)
+                dates_out.append(date)
+                ids_out.append(ID)
+                values_out.append(beta)
 
-        ret = pd.concat(storage).sort_index()
+        index = pd.MultiIndex.from_arrays([dates_out, ids_out], names=('DateTime', 'ID'))
+        ret = pd.Series(values_out, index=index).sort_index()
         return ret
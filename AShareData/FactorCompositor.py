@@ -62,9 +62,10 @@ class ConstLimitStockFactorCompositor(FactorCompositor):
             pbar.set_description('更新股票一字板')
             for date in dates:
                 data = self.db_interface.read_table(price_table_name, ['最高价', '最低价'], dates=[date])
-                no_price_move_tickers = data.loc[data['最高价'] == data['最低价']].index.get_level_values('ID').tolist()
-                if no_price_move_tickers:
-                    target_stocks = list(set(no_price_move_tickers) - set(self.paused_stock_selector.ticker(date)))
+                no_price_move_tickers = data.loc[data['最高价'] == data['最低价']].index.get_level_values('ID')
+                if not no_price_move_tickers.empty:
+                    paused_tickers = self.paused_stock_selector.ticker(date)
+                    target_stocks = no_price_move_tickers.difference(paused_tickers).tolist()
                     if target_stocks:
                         adj_factor = self.data_reader.adj_factor.get_data(start_date=pre_date, end_date=date,
                                                                           ids=target_stocks)
@@ -8,7 +8,7 @@ import pandas as pd
 from . import DateUtils
 from .config import get_db_interface
 from .DBInterface import DBInterface
-from .Factor import CompactFactor, CompactRecordFactor, IndustryFactor, OnTheRecordFactor
+from .Factor import _get_calendar, CompactFactor, CompactRecordFactor, IndustryFactor, OnTheRecordFactor
 from .utils import StockSelectionPolicy, TickerSelector
 
 
@@ -30,27 +30,34 @@ class TickersBase(object):
         """ return tickers that are alive on `date`, `date` default to today"""
         if date is None:
             date = dt.datetime.today()
-        stock_ticker_df = self.cache.loc[self.cache.DateTime <= date]
-        tmp = stock_ticker_df.groupby('ID').tail(1)
+        # cache 按 DateTime 排序, 二分查找截断位置即可
+        loc = self.cache.DateTime.searchsorted(date, side='right')
+        tmp = self.cache.iloc[:loc].drop_duplicates('ID', keep='last')
         return sorted(tmp.loc[tmp['上市状态'] == 1, 'ID'].tolist())
 
     def list_date(self) -> Dict[str, dt.datetime]:
         """ return the list date of all tickers"""
-        first_list_info = self.cache.groupby('ID').head(1)
-        return dict(zip(first_list_info.ID, first_list_info.DateTime))
+        first_list_info = self.cache.drop_duplicates('ID', keep='first')
+        return dict(zip(first_list_info['ID'].to_numpy(), first_list_info['DateTime'].dt.to_pydatetime()))
+
+    @cached_property
+    def _list_date_lookup(self) -> pd.Series:
+        first_list_info = self.cache.drop_duplicates('ID', keep='first')
+        return pd.Series(first_list_info['DateTime'].to_numpy(), index=first_list_info['ID'].astype(str))
 
     def get_list_date(self, ticker: str):
         """ return the list date of a ticker"""
-        info = self.cache.loc[self.cache.ID == ticker, :]
-        return info.DateTime.iloc[0]
+        return self._list_date_lookup[ticker]
 
     def new_ticker(self, start_date: dt.datetime, end_date: dt.datetime = None) -> List[str]:
         if end_date is None:
             end_date = dt.datetime.today()
         if start_date is None:
             start_date = dt.datetime(1990, 12, 19)
-        u_data = self.cache.loc[(start_date <= self.cache.DateTime) & (self.cache.DateTime <= end_date), :]
-        tmp = u_data.groupby('ID').tail(1)
+        start_loc = self.cache.DateTime.searchsorted(start_date, side='left')
+        end_loc = self.cache.DateTime.searchsorted(end_date, side='right')
+        u_data = self.cache.iloc[start_loc:end_loc]
+        tmp = u_data.drop_duplicates('ID', keep='last')
         return sorted(tmp.loc[tmp['上市状态'] == 1, 'ID'].tolist())
 
 
@@ -60,6 +67,8 @@ class DiscreteTickers(TickersBase):
     def __init__(self, asset_type: str, db_interface: DBInterface = None) -> None:
         super().__init__(db_interface)
         self.cache = self.db_interface.read_table('证券代码', text_statement=f'证券类型="{asset_type}"').reset_index()
+        self.cache['ID'] = self.cache['ID'].astype('category')
+        self.cache = self.cache.sort_values(['DateTime', 'ID']).reset_index(drop=True)
 
 
 class StockTickers(DiscreteTickers):
@@ -124,6 +133,8 @@ class ConglomerateTickers(TickersBase):
     def __init__(self, sql_statement: str, db_interface: DBInterface = None) -> None:
         super().__init__(db_interface)
         self.cache = self.db_interface.read_table('证券代码', text_statement=sql_statement).reset_index()
+        self.cache['ID'] = self.cache['ID'].astype('category')
+        self.cache = self.cache.sort_values(['DateTime', 'ID']).reset_index(drop=True)
 
 
 class OptionTickers(ConglomerateTickers):
@@ -221,7 +232,7 @@ class StockTickerSelector(TickerSelector):
 
     @cached_property
     def calendar(self):
-        return DateUtils.TradingCalendar(self.db_interface)
+        return _get_calendar(self.db_interface)
 
     @cached_property
     def paused_stock_selector(self):
@@ -250,8 +261,7 @@ class StockTickerSelector(TickerSelector):
         :param ids: tickers to select from
         :return: list of ticker that satisfy the stock selection policy
         """
-        if ids is None:
-            ids = set(self.stock_ticker.ticker(date))
+        ids = set(self.stock_ticker.ticker(date)) if ids is None else set(ids)
 
         if self.policy.ignore_new_stock_period or self.policy.select_new_stock_period:
             start_date, end_date = None, None
@@ -259,32 +269,31 @@ class StockTickerSelector(TickerSelector):
                 end_date = self.calendar.offset(date, -self.policy.ignore_new_stock_period)
             if self.policy.select_new_stock_period:
                 start_date = self.calendar.offset(date, -self.policy.select_new_stock_period - 1)
-            ids = set(self.stock_ticker.new_ticker(start_date=start_date, end_date=end_date)) & ids
+            ids.intersection_update(self.stock_ticker.new_ticker(start_date=start_date, end_date=end_date))
 
         if self.industry_info and self.policy.industry:
-            ids = ids & set(self.industry_info.list_constitutes(date=date, industry=self.policy.industry))
+            ids.intersection_update(self.industry_info.list_constitutes(date=date, industry=self.policy.industry))
         if self.policy.ignore_const_limit:
-            ids = ids - set(self.const_limit_selector.get_data(date))
+            ids.difference_update(self.const_limit_selector.get_data(date))
 
         if self.policy.ignore_pause:
-            ids = ids - set(self.paused_stock_selector.get_data(date))
+            ids.difference_update(self.paused_stock_selector.get_data(date))
         elif self.policy.select_pause:
-            ids = ids & set(self.paused_stock_selector.get_data(date))
+            ids.intersection_update(self.paused_stock_selector.get_data(date))
         if self.policy.max_pause_days:
             pause_days, period_length = self.policy.max_pause_days
             start_date = self.calendar.offset(date, -period_length)
             end_date = self.calendar.offset(date, -1)
             pause_counts = self.paused_stock_selector.get_counts(start_date=start_date, end_date=end_date)
             pause_counts = pause_counts.loc[pause_counts > pause_days]
-            ids = ids - set(pause_counts.index.get_level_values('ID'))
+            ids.difference_update(pause_counts.index.get_level_values('ID'))
 
         if self.policy.select_st:
-            ids = ids & set(self.risk_warned_stock_selector.get_data(date))
+            ids.intersection_update(self.risk_warned_stock_selector.get_data(date))
         elif self.policy.ignore_st:
-            ids = ids - set(self.risk_warned_stock_selector.get_data(date))
+            ids.difference_update(self.risk_warned_stock_selector.get_data(date))
 
-        ids = sorted(list(ids))
-        return ids
+        return sorted(ids)
 
     def generate_index(self, start_date: DateUtils.DateType = None, end_date: DateUtils.DateType = None,
                        dates: Union[DateUtils.DateType, Sequence[DateUtils.DateType]] = None) -> pd.MultiIndex:
@@ -432,7 +432,7 @@ class TushareData(DataSource):
 
         # pre data:
         def get_pre_data(tn: str) -> pd.Series:
-            return self.db_interface.read_table(tn, tn, end_date=pre_date).groupby('ID').tail(1)
+            return self.db_interface.read_snapshot(tn, tn, date=pre_date)
 
         pre_adj_factor = get_pre_data('复权因子')
         pre_dict = {'total_share': get_pre_data('总股本'),
@@ -331,7 +331,7 @@ class WindData(DataSource):
                                       date=latest).dropna()
             self.db_interface.insert_df(initial_data, table_name)
         else:
-            initial_data = self.db_interface.read_table(table_name).groupby('ID').tail(1)
+            initial_data = self.db_interface.read_snapshot(table_name)
 
         new_data = _get_industry_data(ticker=self.stock_list.ticker(), date=query_date).dropna()
 
@@ -529,8 +529,7 @@ class WindData(DataSource):
             default_start_date = self.stock_list.list_date()
         if ticker is None:
             ticker = self.stock_list.all_ticker()
-        current_data = self.db_interface.read_table(table_name).groupby('ID').tail(1)
-        current_data = current_data.loc[current_data.index.get_level_values('ID').isin(ticker), :]
+        current_data = self.db_interface.read_snapshot(table_name, ids=ticker)
         end_date = self.calendar.yesterday()
         new_data = data_func(ticker=ticker, date=end_date)
         new_data.name = table_name
@@ -23,6 +23,11 @@ class MyTestCase(unittest.TestCase):
         print(self.db.adj_factor.get_data(end_date=self.end_date, ids=self.ids))
         print(self.db.adj_factor.get_data(dates=self.dates, ids=self.ids))
 
+    def test_prefetch_compact_factors(self):
+        self.db.prefetch_compact_factors()
+        print(self.db.adj_factor.get_data(dates=self.dates, ids=self.ids))
+        print(self.db.sec_name.get_data(dates=self.dates, ids=self.ids))
+
     def test_stocks(self):
         print(self.db.stocks)
 
@@ -91,6 +91,12 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(ReportingDate.offset(dt.datetime(2020, 3, 31), 'q1'), dt.datetime(2019, 12, 31))
         self.assertEqual(ReportingDate.offset(dt.datetime(2020, 3, 31), 'y1'), dt.datetime(2019, 12, 31))
 
+    def test_report_date_offset_index(self):
+        report_dates = [dt.datetime(2020, 3, 31), dt.datetime(2020, 6, 30), dt.datetime(2019, 12, 31)]
+        for offset_str in ['q1', 'q4', 'q5', 'y1', 'y2']:
+            expected = [ReportingDate.offset(it, offset_str) for it in report_dates]
+            self.assertEqual(ReportingDate.offset_index(report_dates, offset_str).to_pydatetime().tolist(), expected)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -23,6 +23,13 @@ class MyTestCase(unittest.TestCase):
         print(self.db_interface.read_table(table_name, factor_name, start_date=start_date).head())
         print(self.db_interface.read_table(table_name, factor_name, report_period=report_period).head())
 
+    def test_read_snapshot(self):
+        table_name = '复权因子'
+        date = date_type2datetime('20200101')
+        print(self.db_interface.read_snapshot(table_name).head())
+        print(self.db_interface.read_snapshot(table_name, table_name, date=date).head())
+        print(self.db_interface.read_snapshot(table_name, date=date, ids=['000001.SZ'], inclusive=False))
+
     def test_calendar(self):
         self.db_interface.read_table('交易日历')
 
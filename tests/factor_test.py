@@ -64,6 +64,15 @@ class MyTestCase(unittest.TestCase):
         a = f.get_data(start_date=self.start_date, end_date=self.end_date, ids=self.ids)
         print(a)
 
+    def test_accounting_factor_dates(self):
+        dates = self.calendar.select_dates(self.start_date, self.end_date)[::5]
+        f = QOQAccountingFactor('期末总股本', self.db_interface)
+        a = f.get_data(dates=dates, ids=self.ids)
+        print(a)
+        self.assertTrue(a.index.get_level_values('DateTime').isin(dates).all())
+        self.assertTrue(a.index.get_level_values('ID').isin(self.ids).all())
+        self.assertTrue(a.index.is_monotonic_increasing)
+
     def test_yoy_period_report_factor(self):
         f = YOYPeriodAccountingFactor('期末总股本', self.db_interface)
         a = f.get_data(start_date=self.start_date, end_date=self.end_date, ids=self.ids)